@@ -9,8 +9,10 @@ from tkinter import filedialog, messagebox
 import customtkinter as ctk
 from PIL import Image, ImageTk
 import numpy as np
-import threading
+import functools
 import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from tkinterdnd2 import TkinterDnD, DND_FILES
@@ -18,6 +20,12 @@ try:
 except ImportError:
     DND_AVAILABLE = False
 
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
 from engine import Engine
 
 ctk.set_appearance_mode("Dark")
@@ -27,42 +35,158 @@ SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
 PREVIEW_SIZE  = 380
 MAX_HISTORY   = 20
 
+@functools.lru_cache(maxsize=2)
 def make_checkerboard(width: int, height: int, tile: int = 12, dark: bool = False) -> np.ndarray:
-    """Generate an RGB checkerboard numpy array (fast, no Python loops)."""
-    xs   = np.arange(width)  // tile
-    ys   = np.arange(height) // tile
-    mask = (xs[np.newaxis, :] + ys[:, np.newaxis]) % 2 == 0
-    
+    """
+    Generate an RGB checkerboard numpy array by tiling a single 2x2-tile cell.
+    Results are cached per size and returned read-only (contiguous, so the
+    composites can copy and multiply it at full speed); callers must not
+    write into them.
+    """
     c1, c2 = (60, 40) if dark else (200, 155)
-    
-    arr  = np.where(mask[:, :, np.newaxis], c1, c2).astype(np.uint8)
-    return np.repeat(arr, 3, axis=2)
 
-def composite_np(rgba_np: np.ndarray, dark_bg: bool = False) -> np.ndarray:
+    cell = np.full((tile * 2, tile * 2, 3), c2, dtype=np.uint8)
+    cell[:tile, :tile] = c1
+    cell[tile:, tile:] = c1
+
+    reps    = (-(-height // (tile * 2)), -(-width // (tile * 2)), 1)
+    checker = np.ascontiguousarray(np.tile(cell, reps)[:height, :width])
+    checker.setflags(write=False)
+    return checker
+
+def _shift8_to_uint8(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """x >> 8 narrowed to uint8 in a single pass, into `out` if given."""
+    if out is None:
+        out = np.empty(x.shape, dtype=np.uint8)
+    return np.right_shift(x, 8, out=out, casting="unsafe")
+
+def _div255(x: np.ndarray, out: np.ndarray = None, tmp: np.ndarray = None) -> np.ndarray:
+    """Exact rounded x / 255 for a uint16 array with x <= 255 * 255 (in place), as uint8."""
+    x += 128
+    x += np.right_shift(x, 8, out=tmp)
+    return _shift8_to_uint8(x, out)
+
+def composite_np(rgba_np: np.ndarray, dark_bg: bool = False, out: np.ndarray = None,
+                 scratch: np.ndarray = None) -> np.ndarray:
     """
     Composite an RGBA numpy array onto a checkerboard.
     Accepts a `dark_bg` parameter for a bright image removal mode.
+    Blends in uint16 fixed point (no float intermediates).
+    If `out` (H, W, 3 uint8) is given, the result is written there; a
+    `scratch` (2, H, W, 3 uint16) work buffer avoids per-call temporaries.
+    `scratch` may also be a callable returning that buffer, which is only
+    called when the full blend actually runs.
+
+    Segmentation masks are mostly fully opaque or fully transparent, so when
+    the soft edge band (0 < alpha < 255) is small, those pixels are plain
+    copies and only the band is blended.
     """
     h, w    = rgba_np.shape[:2]
     checker = make_checkerboard(w, h, dark=dark_bg)
-    alpha   = rgba_np[:, :, 3:4].astype(np.float32) / 255.0
-    rgb     = rgba_np[:, :, :3].astype(np.float32)
-    result  = (rgb * alpha + checker.astype(np.float32) * (1.0 - alpha))
-    return result.astype(np.uint8)
-
-def composite_repair_np(rgba_np: np.ndarray, orig_np: np.ndarray,
-                        bg_opacity: float = 0.30) -> np.ndarray:
+    coverage = rgba_np[:, :, 3]
+    soft    = (coverage - 1) < 254   # 0 < alpha < 255 (uint8 wraps 0)
+    if np.count_nonzero(soft) <= coverage.size // 8:
+        soft = np.flatnonzero(soft)
+        if out is None:
+            out = np.empty((h, w, 3), dtype=np.uint8)
+        np.copyto(out, checker)
+        np.copyto(out, rgba_np[:, :, :3], where=(coverage == 255)[:, :, np.newaxis])
+        if soft.size:
+            ys, xs = np.divmod(soft, w)
+            alpha  = coverage[ys, xs, np.newaxis].astype(np.uint16)
+            result = rgba_np[ys, xs, :3].astype(np.uint16)
+            result *= alpha
+            result += checker[ys, xs] * (255 - alpha)
+            out[ys, xs] = _div255(result)
+        return out
+
+    alpha   = rgba_np[:, :, 3:4].astype(np.uint16)
+    if callable(scratch):
+        scratch = scratch()
+    if scratch is None:
+        result, tmp = rgba_np[:, :, :3].astype(np.uint16), None
+    else:
+        result, tmp = scratch
+        np.copyto(result, rgba_np[:, :, :3])
+    # fg*a + bg*(255-a) == bg*255 + (fg-bg)*a. The right-hand terms wrap in
+    # uint16, but the sum is within [0, 255*255], so it comes out exact.
+    result -= checker
+    result *= alpha
+    result += np.multiply(checker, 255, out=tmp, dtype=np.uint16)
+    return _div255(result, out, tmp)
+
+@functools.lru_cache(maxsize=4)
+def _repair_gain_lut(bg_opacity: float) -> np.ndarray:
+    """8.8 fixed-point gain per alpha level: alpha/255 + bg_opacity * (1 - alpha/255)."""
+    levels = np.arange(256, dtype=np.float32)
+    gain   = np.rint((levels + bg_opacity * (255 - levels)) * (256 / 255)).astype(np.uint16)
+    gain.setflags(write=False)
+    return gain
+
+def composite_repair_np(alpha_np: np.ndarray, orig_np: np.ndarray,
+                        bg_opacity: float = 0.30, out: np.ndarray = None,
+                        scratch: np.ndarray = None) -> np.ndarray:
     """
     Create a composite for Repair Mode:
     Foreground = 100% of the original image.
     Background = 50% (or as per bg_opacity) of the original image.
+
+    Both layers are the original image, so the blend collapses to
+    orig * gain(alpha): one lookup in a 256-entry 8.8 fixed-point gain
+    table and one uint16 multiply per channel. Only the (H, W) alpha plane
+    of the result is needed. `out` is as in composite_np; only the first
+    plane of `scratch` is used, so (1, H, W, 3) is enough.
+    """
+    if scratch is None:
+        result = orig_np.astype(np.uint16)
+    else:
+        result = scratch[0]
+        np.copyto(result, orig_np)
+    result *= _repair_gain_lut(bg_opacity)[alpha_np][:, :, np.newaxis]
+    result += 128
+    return _shift8_to_uint8(result, out)
+
+@functools.lru_cache(maxsize=80)
+def _disk_mask(r: int) -> np.ndarray:
+    """Read-only (2r+1, 2r+1) boolean brush disk of radius r, cached per radius."""
+    d = np.arange(-r, r + 1)
+    disk = (d[np.newaxis, :] ** 2 + d[:, np.newaxis] ** 2) <= r * r
+    disk.setflags(write=False)
+    return disk
+
+def downscale_np(arr: np.ndarray, size: tuple) -> np.ndarray:
+    """
+    Downscale an (H, W, 3|4) uint8 array to size = (width, height).
+    Uses OpenCV INTER_AREA when available; otherwise Pillow BILINEAR, with
+    full-res sources box-reduced by an integer factor first (reducing_gap)
+    so BILINEAR only does the last <2x step.
     """
-    alpha  = rgba_np[:, :, 3:4].astype(np.float32) / 255.0
-    orig_float = orig_np.astype(np.float32)
-    fg = orig_float
-    bg = orig_float * bg_opacity
-    result = fg * alpha + bg * (1.0 - alpha)
-    return np.clip(result, 0, 255).astype(np.uint8)
+    if CV2_AVAILABLE:
+        return cv2.resize(arr, size, interpolation=cv2.INTER_AREA)
+    mode = "RGBA" if arr.shape[2] == 4 else "RGB"
+    pil  = Image.fromarray(arr, mode=mode).resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return np.array(pil, dtype=np.uint8)
+
+def _decode_rgb(path: str) -> Image.Image:
+    """Fully decode an image file as RGB (used to preload the inference input)."""
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+def _segment_mask(h: int, w: int, ax: int, ay: int, bx: int, by: int, r: int) -> np.ndarray:
+    """
+    Boolean (h, w) mask of the pixels within r of the segment (ax, ay)-(bx, by),
+    i.e. the brush disk swept along it, computed in one pass over the box.
+    """
+    xs = np.arange(w, dtype=np.float32)[np.newaxis, :] - ax
+    ys = np.arange(h, dtype=np.float32)[:, np.newaxis] - ay
+    dx, dy = float(bx - ax), float(by - ay)
+    seg_len2 = dx * dx + dy * dy
+    if seg_len2 == 0:
+        return (xs * xs + ys * ys) <= r * r
+    t = np.clip((xs * dx + ys * dy) / seg_len2, 0.0, 1.0)
+    ex = xs - t * dx
+    ey = ys - t * dy
+    return (ex * ex + ey * ey) <= r * r
 
 def rgb2lab_manual(rgb: np.ndarray) -> np.ndarray:
     """
@@ -152,7 +276,7 @@ class RepairWindow(ctk.CTkToplevel):
 
         # Save data full size
         self.full_np = np.array(result_image, dtype=np.uint8)          # RGBA
-        self.original_full_np = original_np.copy()                    # RGB
+        self.original_full_np = original_np                           # RGB, read-only
 
         self.title("pvBG - Repair Mask")
         self.geometry("900x700")
@@ -176,6 +300,9 @@ class RepairWindow(ctk.CTkToplevel):
         self.last_mouse_y = None
         self.history = []         
         self.redo_stack = []
+        self._stroke_base = None
+        self._stroke_bbox = None
+        self.edited_bbox = None
         self.last_xy = None
         self.pan_start = None          
         self.pan_start_offset = None   
@@ -188,12 +315,19 @@ class RepairWindow(ctk.CTkToplevel):
         # Display data
         self.disp_np = None       
         self.disp_orig_np = None   
+        self.zoom_orig_np = None
         self.disp_orig_lab = None  
         self.disp_w = 0
         self.disp_h = 0
         self.canvas_offset = (0, 0)
         self.canvas_photo = None
+        self.canvas_item = None
+        self.canvas_item_pos = None
+        self.frame_np = None
+        self.frame_scratch = None
+        self.frame_img = None
         self.cursor_oval = None
+        self._refresh_pending = False
 
         # Icons
         self._load_icons()
@@ -340,14 +474,19 @@ class RepairWindow(ctk.CTkToplevel):
             if self.disp_np is not None:
                 disp_pil = Image.fromarray(self.disp_np, mode="RGBA").resize((dw, dh), Image.Resampling.BILINEAR)
                 self.disp_np = np.array(disp_pil, dtype=np.uint8)
+                if self.edited_bbox is not None:
+                    # Rescale the edited region, padded for the resample footprint
+                    y0, y1, x0, x1 = self.edited_bbox
+                    sy, sx = dh / self.disp_h, dw / self.disp_w
+                    self.edited_bbox = (max(0, int(y0 * sy) - 1), min(dh, int(np.ceil(y1 * sy)) + 1),
+                                        max(0, int(x0 * sx) - 1), min(dw, int(np.ceil(x1 * sx)) + 1))
             # Otherwise, create it from scratch (on initialization)
             else:
-                disp_pil = Image.fromarray(self.full_np, mode="RGBA").resize((dw, dh), Image.Resampling.BILINEAR)
-                self.disp_np = np.array(disp_pil, dtype=np.uint8)
+                self.disp_np = downscale_np(self.full_np, (dw, dh))
 
             # Always downscale the original image from the full-res source
-            orig_pil = Image.fromarray(self.original_full_np, mode="RGB").resize((dw, dh), Image.Resampling.BILINEAR)
-            self.disp_orig_np = np.array(orig_pil, dtype=np.uint8)
+            self.disp_orig_np = downscale_np(self.original_full_np, (dw, dh))
+            self.zoom_orig_np = None
             
             # Pre-convert to LAB for Magic Tools using the manual function
             self.disp_orig_lab = rgb2lab_manual(self.disp_orig_np)
@@ -355,6 +494,10 @@ class RepairWindow(ctk.CTkToplevel):
             self.disp_w = dw
             self.disp_h = dh
 
+            # History tiles are stored in display coordinates
+            self.history.clear()
+            self.redo_stack.clear()
+
         # Update offset and refresh canvas
         if self.zoom_offset is None:
             cw = self.canvas.winfo_width()
@@ -370,29 +513,91 @@ class RepairWindow(ctk.CTkToplevel):
         if self.disp_np is None:
             return
 
+        h, w = self.disp_np.shape[:2]
+        frame = self._frame_buffer(w, h)
         if self.repair_mode.get() == "restore":
-            comp_np = composite_repair_np(self.disp_np, self.disp_orig_np, bg_opacity=0.5)
+            composite_repair_np(self.disp_np[:, :, 3], self.disp_orig_np, bg_opacity=0.5,
+                                out=frame, scratch=self._blend_scratch(1))
         else:
-            comp_np = composite_np(self.disp_np, dark_bg=self.dark_bg_mode.get())
+            composite_np(self.disp_np, dark_bg=self.dark_bg_mode.get(),
+                         out=frame, scratch=self._blend_scratch)
+        self.frame_img.frombytes(frame)
 
-        img = Image.fromarray(comp_np, mode="RGB")
-        ox, oy = self.canvas_offset
-        self.canvas_photo = ImageTk.PhotoImage(img)
-        self.canvas.delete("base")
-        self.canvas.create_image(ox, oy, anchor="nw", image=self.canvas_photo, tags="base")
+        self._show_on_canvas(self.frame_img, *self.canvas_offset)
 
         if self.cursor_oval is None:
             self.cursor_oval = self.canvas.create_oval(0, 0, 0, 0,
                                                         outline="#ffffff", width=1, dash=(3,3), tags="cursor")
         self.canvas.tag_raise("cursor")
 
+    def _frame_buffer(self, w: int, h: int) -> np.ndarray:
+        """
+        Return the persistent (h, w, 3) composite buffer. Its PIL twin
+        `frame_img` is refilled in place with frombytes, so a refresh makes
+        no new arrays or PIL images before the upload to Tk.
+        """
+        if self.frame_np is None or self.frame_np.shape[:2] != (h, w):
+            self.frame_np = np.empty((h, w, 3), dtype=np.uint8)
+            self.frame_scratch = None
+            self.frame_img = Image.new("RGB", (w, h))
+        return self.frame_np
+
+    def _blend_scratch(self, planes: int = 2) -> np.ndarray:
+        """
+        uint16 blend intermediates for the current frame, allocated on first
+        use: the usual soft-band composite never needs them.
+        """
+        h, w = self.frame_np.shape[:2]
+        if self.frame_scratch is None or self.frame_scratch.shape[0] < planes:
+            self.frame_scratch = np.empty((planes, h, w, 3), dtype=np.uint16)
+        return self.frame_scratch
+
+    def _show_on_canvas(self, img: Image.Image, ox: int, oy: int):
+        """
+        Show a composited frame on the canvas, reusing the PhotoImage and the
+        canvas item when the frame size is unchanged.
+        """
+        photo = self.canvas_photo
+        if photo is not None and (photo.width(), photo.height()) == img.size:
+            photo.paste(img)
+        else:
+            self.canvas_photo = ImageTk.PhotoImage(img)
+            if self.canvas_item is not None:
+                self.canvas.itemconfigure(self.canvas_item, image=self.canvas_photo)
+
+        if self.canvas_item is None:
+            self.canvas_item = self.canvas.create_image(ox, oy, anchor="nw",
+                                                        image=self.canvas_photo, tags="base")
+        elif self.canvas_item_pos != (ox, oy):
+            self.canvas.coords(self.canvas_item, ox, oy)
+        self.canvas_item_pos = (ox, oy)
+
     def _commit_display_to_fullres(self):
-        """Upscale the editing result from display to full resolution."""
-        if self.disp_np is None:
+        """
+        Upscale the editing result from display to full resolution. Only the
+        region touched by strokes is resampled and spliced back, so untouched
+        pixels keep their full-res detail.
+        """
+        if self.disp_np is None or self.edited_bbox is None:
             return
         disp_pil = Image.fromarray(self.disp_np, mode="RGBA")
         h, w = self.full_np.shape[:2]
-        self.full_np = np.array(disp_pil.resize((w, h), Image.Resampling.BILINEAR), dtype=np.uint8)
+        dh, dw = self.disp_np.shape[:2]
+
+        # One display pixel of margin: the bilinear upscale spreads each
+        # edited pixel into its neighbours.
+        y0, y1, x0, x1 = self.edited_bbox
+        y0 = max(0, y0 - 1); y1 = min(dh, y1 + 1)
+        x0 = max(0, x0 - 1); x1 = min(dw, x1 + 1)
+        if (y1 - y0) * (x1 - x0) > 0.8 * dh * dw:
+            self.full_np = np.array(disp_pil.resize((w, h), Image.Resampling.BILINEAR), dtype=np.uint8)
+            return
+
+        fx0 = x0 * w // dw; fx1 = -(-x1 * w // dw)
+        fy0 = y0 * h // dh; fy1 = -(-y1 * h // dh)
+        box = (fx0 * dw / w, fy0 * dh / h, fx1 * dw / w, fy1 * dh / h)
+        patch = disp_pil.resize((fx1 - fx0, fy1 - fy0), Image.Resampling.BILINEAR, box=box)
+        self.full_np[fy0:fy1, fx0:fx1] = np.asarray(patch)
 
     def _on_canvas_resize(self, event):
         self._rebuild_display_cache()
@@ -492,6 +697,22 @@ class RepairWindow(ctk.CTkToplevel):
         else:
             return None
 
+    def _canvas_to_display_many(self, cx: np.ndarray, cy: np.ndarray):
+        """Vectorized _canvas_to_display; points outside the image are dropped."""
+        if self.zoom_disp_w == 0 or self.zoom_disp_h == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        ox, oy = self.zoom_offset
+        zf = self.zoom_factor.get()
+        img_zx = cx - ox
+        img_zy = cy - oy
+
+        inside = (0 <= img_zx) & (img_zx < self.zoom_disp_w) & (0 <= img_zy) & (img_zy < self.zoom_disp_h)
+        ix = np.clip((img_zx[inside] / zf).astype(np.intp), 0, self.disp_w - 1)
+        iy = np.clip((img_zy[inside] / zf).astype(np.intp), 0, self.disp_h - 1)
+        return ix, iy
+
     def _update_zoom_display(self):
         """Update the canvas view with the zoomed image."""
         if self.disp_np is None:
@@ -502,30 +723,29 @@ class RepairWindow(ctk.CTkToplevel):
         self.zoom_disp_w = new_w
         self.zoom_disp_h = new_h
 
-        rgba_pil = Image.fromarray(self.disp_np, mode="RGBA").resize((new_w, new_h), Image.Resampling.BILINEAR)
-        zoom_rgba = np.array(rgba_pil, dtype=np.uint8)
-        orig_pil = Image.fromarray(self.disp_orig_np, mode="RGB").resize((new_w, new_h), Image.Resampling.BILINEAR)
-        zoom_orig = np.array(orig_pil, dtype=np.uint8)
-
+        # At 1:1 the display cache is composited directly: no resample, and
+        # hard alpha edges stay hard, so composite_np takes its copy-only path.
+        one_to_one = (new_w, new_h) == (self.disp_w, self.disp_h)
+        frame = self._frame_buffer(new_w, new_h)
         if self.repair_mode.get() == "restore":
-            comp_np = composite_repair_np(zoom_rgba, zoom_orig, bg_opacity=0.5)
+            # Restore view only reads alpha: zoom that one plane, not all four
+            zoom_alpha = self.disp_np[:, :, 3]
+            if not one_to_one:
+                zoom_alpha = np.asarray(Image.fromarray(zoom_alpha).resize((new_w, new_h), Image.Resampling.BILINEAR))
+            composite_repair_np(zoom_alpha, self._zoomed_original(new_w, new_h), bg_opacity=0.5,
+                                out=frame, scratch=self._blend_scratch(1))
         else:
-            comp_np = composite_np(zoom_rgba, dark_bg=self.dark_bg_mode.get())
+            zoom_rgba = self.disp_np
+            if not one_to_one:
+                rgba_pil = Image.fromarray(self.disp_np, mode="RGBA").resize((new_w, new_h), Image.Resampling.BILINEAR)
+                zoom_rgba = np.array(rgba_pil, dtype=np.uint8)
+            composite_np(zoom_rgba, dark_bg=self.dark_bg_mode.get(),
+                         out=frame, scratch=self._blend_scratch)
+        self.frame_img.frombytes(frame)
 
-        comp_img = Image.fromarray(comp_np, mode="RGB")
-        self.canvas_photo = ImageTk.PhotoImage(comp_img)
-        
-        cw = self.canvas.winfo_width()
-        ch = self.canvas.winfo_height()
-        if cw < 2 or ch < 2:
-            cw, ch = 800, 600 
         ox, oy = self.zoom_offset
-        self.canvas.delete("base")
-        self.canvas.create_image(ox, oy, anchor="nw", image=self.canvas_photo, tags="base")
+        self._show_on_canvas(self.frame_img, ox, oy)
 
-        self.canvas.delete("base")
-        self.canvas.create_image(ox, oy, anchor="nw", image=self.canvas_photo, tags="base")
-        
         if self.cursor_oval is None:
             self.cursor_oval = self.canvas.create_oval(0, 0, 0, 0,
                                                         outline="#ffffff", width=1, dash=(3,3), tags="cursor")
@@ -539,60 +759,149 @@ class RepairWindow(ctk.CTkToplevel):
             e.y = self.last_mouse_y
             self._on_mouse_move(e)
 
+    def _zoomed_original(self, w: int, h: int) -> np.ndarray:
+        """
+        The display-size original resampled to the zoomed size. It only
+        changes with the zoom or the display cache, so it is cached instead
+        of being resized again on every brush refresh.
+        """
+        if (w, h) == (self.disp_w, self.disp_h):
+            return self.disp_orig_np
+        if self.zoom_orig_np is None or self.zoom_orig_np.shape[:2] != (h, w):
+            orig_pil = Image.fromarray(self.disp_orig_np, mode="RGB").resize((w, h), Image.Resampling.BILINEAR)
+            self.zoom_orig_np = np.array(orig_pil, dtype=np.uint8)
+        return self.zoom_orig_np
+
+    def _schedule_refresh(self):
+        """
+        Coalesce canvas refreshes during drags: motion events only mark the
+        view dirty, and one composite runs once Tk's event queue is drained.
+        """
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self._do_refresh)
+
+    def _do_refresh(self):
+        self._refresh_pending = False
+        if self.winfo_exists():
+            self._update_zoom_display()
+
     def _push_history(self):
-        """Save the display state to the undo stack."""
-        if self.disp_np is not None:
-            self.history.append(self.disp_np.copy())
-            if len(self.history) > MAX_HISTORY:
-                self.history.pop(0)
+        """
+        Save the finished stroke to the undo stack as a pair of tiles: the
+        bounding box it touched, before and after the stroke, each
+        zlib-compressed. Undo and redo write a tile back by assignment, so
+        they stay correct even if the pixels changed in between.
+        """
+        base, bbox = self._stroke_base, self._stroke_bbox
+        self._stroke_base = None
+        self._stroke_bbox = None
+        if base is None or bbox is None or base.shape != self.disp_np.shape:
+            return
+        y0, y1, x0, x1 = bbox
+        region = np.s_[y0:y1, x0:x1]
+        before = zlib.compress(np.ascontiguousarray(base[region]).tobytes(), 1)
+        after = zlib.compress(np.ascontiguousarray(self.disp_np[region]).tobytes(), 1)
+        self.history.append((region, before, after))
+        if len(self.history) > MAX_HISTORY:
+            self.history.pop(0)
+
+    def _restore_tile(self, region, packed):
+        """Write a compressed history tile back into the display cache."""
+        tile = self.disp_np[region]
+        tile[...] = np.frombuffer(zlib.decompress(packed), dtype=np.uint8).reshape(tile.shape)
 
     def _undo(self):
+        if self._stroke_base is not None:
+            self._push_history()
         if not self.history:
             return
-        self.redo_stack.append(self.disp_np.copy())
-        self.disp_np = self.history.pop()
+        entry = self.history.pop()
+        self._restore_tile(entry[0], entry[1])
+        self.redo_stack.append(entry)
         self._update_zoom_display()
 
     def _redo(self):
         if not self.redo_stack:
             return
-        self._push_history()
-        self.disp_np = self.redo_stack.pop()
+        entry = self.redo_stack.pop()
+        self._restore_tile(entry[0], entry[2])
+        self.history.append(entry)
         self._update_zoom_display()
 
     def _paint_at(self, ix, iy):
         """Apply the brush at the original display coordinates (ix, iy)."""
+        self._paint_stamps(np.array([ix]), np.array([iy]))
+
+    def _paint_stamps(self, ixs: np.ndarray, iys: np.ndarray):
+        """
+        Apply the brush at every display coordinate in (ixs, iys), which are
+        samples along one straight drag segment. The stroke is built as one
+        mask over the common bounding box, then written to the display cache
+        once.
+        """
         if self.disp_np is None:
             return
 
         dh, dw = self.disp_np.shape[:2]
-        if not (0 <= ix < dw and 0 <= iy < dh):
+        inside = (ixs >= 0) & (ixs < dw) & (iys >= 0) & (iys < dh)
+        ixs, iys = ixs[inside], iys[inside]
+        if ixs.size == 0:
             return
 
         r = max(1, self.brush_size.get() // 2)
-        x0 = max(0, ix - r); x1 = min(dw, ix + r + 1)
-        y0 = max(0, iy - r); y1 = min(dh, iy + r + 1)
-        if x0 >= x1 or y0 >= y1:
-            return
-
-        xs = np.arange(x0, x1) - ix
-        ys = np.arange(y0, y1) - iy
-        mask = (xs[np.newaxis, :] ** 2 + ys[:, np.newaxis] ** 2) <= r * r
-
-        if self.magic_mode.get() and self.disp_orig_lab is not None:
-            # Use CIELAB for more perceptually accurate color difference
-            ref_color = self.disp_orig_lab[iy, ix]
-            roi = self.disp_orig_lab[y0:y1, x0:x1]
-            # Delta E (CIE76) is the Euclidean distance in LAB space
-            color_diff = np.linalg.norm(roi - ref_color, axis=2)
-            mask = mask & (color_diff <= self.magic_tol.get())
+        x0 = max(0, int(ixs.min()) - r); x1 = min(dw, int(ixs.max()) + r + 1)
+        y0 = max(0, int(iys.min()) - r); y1 = min(dh, int(iys.max()) + r + 1)
 
+        if self._stroke_bbox is None:
+            self._stroke_bbox = (y0, y1, x0, x1)
+        else:
+            by0, by1, bx0, bx1 = self._stroke_bbox
+            self._stroke_bbox = (min(by0, y0), max(by1, y1), min(bx0, x0), max(bx1, x1))
+        # Apply splices this region back whether or not the stroke reaches history
+        if self.edited_bbox is None:
+            self.edited_bbox = (y0, y1, x0, x1)
+        else:
+            ey0, ey1, ex0, ex1 = self.edited_bbox
+            self.edited_bbox = (min(ey0, y0), max(ey1, y1), min(ex0, x0), max(ex1, x1))
+
+        magic = self.magic_mode.get() and self.disp_orig_lab is not None
+        tol = self.magic_tol.get()
+        if not magic and ixs.size > 1:
+            # Plain brush along a drag segment: rasterize the swept disk in
+            # one pass over the box instead of stamping every sample.
+            mask = _segment_mask(y1 - y0, x1 - x0, ixs[0] - x0, iys[0] - y0,
+                                 ixs[-1] - x0, iys[-1] - y0, r)
+        else:
+            # Single stamp, or magic mode where each stamp has its own
+            # reference colour: OR the clipped disks together.
+            disk = _disk_mask(r)
+            mask = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+            for ix, iy in zip(ixs.tolist(), iys.tolist()):
+                sx0 = max(x0, ix - r); sx1 = min(x1, ix + r + 1)
+                sy0 = max(y0, iy - r); sy1 = min(y1, iy + r + 1)
+                # Clip the cached disk to the part of the stamp inside the image
+                stamp = disk[sy0 - iy + r:sy1 - iy + r, sx0 - ix + r:sx1 - ix + r]
+
+                if magic:
+                    # Use CIELAB for more perceptually accurate color difference
+                    ref_color = self.disp_orig_lab[iy, ix]
+                    roi = self.disp_orig_lab[sy0:sy1, sx0:sx1]
+                    # Delta E (CIE76) is the Euclidean distance in LAB space
+                    color_diff = np.linalg.norm(roi - ref_color, axis=2)
+                    stamp = stamp & (color_diff <= tol)
+
+                mask[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] |= stamp
+
+        # Masked in-place writes: stream over the stamp box without building
+        # gather/scatter index arrays as boolean fancy indexing would.
+        roi = self.disp_np[y0:y1, x0:x1]
         if self.repair_mode.get() == "restore":
-            self.disp_np[y0:y1, x0:x1, :3][mask] = self.disp_orig_np[y0:y1, x0:x1][mask]
-            self.disp_np[y0:y1, x0:x1, 3][mask] = 255
+            np.copyto(roi[:, :, :3], self.disp_orig_np[y0:y1, x0:x1], where=mask[:, :, np.newaxis])
+            np.copyto(roi[:, :, 3], 255, where=mask)
         else:
             # Erase: alpha=0
-            self.disp_np[y0:y1, x0:x1, 3][mask] = 0
+            np.copyto(roi[:, :, 3], 0, where=mask)
 
     def _on_brush_press(self, event):
         if self._on_pan_left_press(event):
@@ -601,7 +910,11 @@ class RepairWindow(ctk.CTkToplevel):
             return
         coord = self._canvas_to_display(event.x, event.y)
         if coord:
-            self._push_history()
+            if self._stroke_base is not None:
+                # The last stroke's release never arrived (e.g. pan toggled mid-drag)
+                self._push_history()
+            self._stroke_base = self.disp_np.copy()
+            self._stroke_bbox = None
             self.redo_stack.clear()
             self._paint_at(coord[0], coord[1])
             self._update_zoom_display()
@@ -616,21 +929,23 @@ class RepairWindow(ctk.CTkToplevel):
         x1, y1 = event.x, event.y
         dist = int(((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5)
         steps = max(1, dist)
-        for i in range(1, steps + 1):
-            t = i / steps
-            cx = x0 + (x1 - x0) * t
-            cy = y0 + (y1 - y0) * t
-            coord = self._canvas_to_display(cx, cy)
-            if coord:
-                self._paint_at(coord[0], coord[1])
+        # Sample one stamp per canvas pixel along the segment; when zoomed in,
+        # consecutive samples land on the same display pixel and are dropped.
+        t = np.arange(1, steps + 1) / steps
+        ixs, iys = self._canvas_to_display_many(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+        if ixs.size:
+            keep = np.ones(ixs.size, dtype=bool)
+            keep[1:] = (ixs[1:] != ixs[:-1]) | (iys[1:] != iys[:-1])
+            self._paint_stamps(ixs[keep], iys[keep])
         self.last_xy = (event.x, event.y)
-        self._update_zoom_display()
+        self._schedule_refresh()
         self._on_mouse_move(event)
 
     def _on_brush_release(self, event):
         if self._on_pan_left_release(event):
             return
         self.last_xy = None
+        self._push_history()
 
     def _on_mouse_move(self, event):
         """Move the cursor circle (size adjusted for zoom)."""
@@ -660,7 +975,7 @@ class RepairWindow(ctk.CTkToplevel):
         dx = event.x - self.pan_start[0]
         dy = event.y - self.pan_start[1]
         self.zoom_offset = (self.pan_start_offset[0] + dx, self.pan_start_offset[1] + dy)
-        self._update_zoom_display()
+        self._schedule_refresh()
 
     def _on_pan_release(self, event):
         """End pan."""
@@ -682,7 +997,7 @@ class RepairWindow(ctk.CTkToplevel):
         dx = event.x - self.pan_start[0]
         dy = event.y - self.pan_start[1]
         self.zoom_offset = (self.pan_start_offset[0] + dx, self.pan_start_offset[1] + dy)
-        self._update_zoom_display()
+        self._schedule_refresh()
         return True
 
     def _on_pan_left_release(self, event):
@@ -754,8 +1069,15 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
         self._current_input_path      = None
         self._orig_photo_ref          = None
         self._original_rgb_np         = None   # full-res RGB numpy
+        self._decode_future           = None   # full-res decode started at load time
+        self._closing                 = False  # set once the window is closing; the worker must not touch Tk
         self.repair_window = None
 
+        # One long-lived worker runs decodes and inference in submission
+        # order, so a preloaded image is always ready before its inference.
+        self._infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pvbg-infer")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
         self._build_ui()
 
         if DND_AVAILABLE:
@@ -930,16 +1252,26 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
             self.repair_window.destroy()
             self.repair_window = None
 
+        # Only the preview is decoded here, at reduced DCT scale for JPEGs.
+        # The engine decodes the full-res image itself during inference.
         try:
-            img = Image.open(path).convert("RGB")
+            img  = Image.open(path)
+            w, h = img.size
+            img.draft("RGB", (PREVIEW_SIZE * 2, PREVIEW_SIZE * 2))
+            thumb = img.convert("RGB")
         except Exception as e:
             self._set_status(f"ERROR: Failed to open image: {e}")
             return
 
         self._current_input_path = path
-        self._original_rgb_np    = np.array(img, dtype=np.uint8)  # keep full-res RGB numpy
+        self._original_rgb_np    = None   # filled from the engine result
+
+        # Decode the full-res image on the worker while the user looks at the
+        # preview; inference picks it up instead of reading the file again.
+        if self._decode_future is not None:
+            self._decode_future.cancel()
+        self._decode_future = self._infer_pool.submit(_decode_rgb, path)
 
-        thumb = img.copy()
         thumb.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
         photo = ctk.CTkImage(light_image=thumb, dark_image=thumb, size=thumb.size)
         self._orig_photo_ref = photo
@@ -952,7 +1284,6 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
         self.btn_process.configure(state="normal", text="Remove Background")
         self.btn_clear.configure(state="normal")
 
-        w, h = img.size
         self._set_status(
             f"Loaded: {os.path.basename(path)}  ({w} × {h} px)"
             f" — Click Remove Background to process."
@@ -973,22 +1304,28 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
         self.lbl_res.configure(image=None, text="Wait: Removing background...\nPlease wait.")
         self._set_status("Wait: pvBG is processing the image. Please wait...")
 
-        threading.Thread(
-            target=self._run_inference,
-            args=(self._current_input_path,),
-            daemon=True
-        ).start()
+        self._infer_pool.submit(self._run_inference, self._current_input_path, self._decode_future)
+        self._decode_future = None   # the worker owns the preloaded image now
 
-    def _run_inference(self, path: str):
+    def _run_inference(self, path: str, decoded=None):
         """
-        Run pvBG inference on a background thread, then schedule
+        Run pvBG inference on the worker thread, then schedule
         the UI update back on the main thread.
         """
         try:
-            result = self.engine.remove_background(path)
+            source = path
+            if decoded is not None and not decoded.cancelled() and decoded.exception() is None:
+                source = decoded.result()
+            # The preloaded decode is private to this job: let the engine consume it
+            result = self.engine.remove_background(source, owned=source is not path)
+            if self._closing:
+                return
+            self._original_rgb_np = None   # taken from the result when repair first opens
             self.current_result = result
             self.after(0, self._show_result)
         except Exception as e:
+            if self._closing:
+                return
             self.after(0, lambda: self._on_inference_error(str(e)))
 
     def _show_result(self):
@@ -1011,11 +1348,10 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
 
     def _display_result_label(self):
         """Render current_result into the standard CTkLabel preview."""
-        rgba_np    = np.array(self.current_result, dtype=np.uint8)
-        comp_np    = composite_np(rgba_np)
-        comp_img   = Image.fromarray(comp_np, mode="RGB")
-        thumb      = comp_img.copy()
-        thumb.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+        thumb_rgba = self.current_result.copy()
+        thumb_rgba.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+        thumb      = Image.fromarray(make_checkerboard(*thumb_rgba.size), mode="RGB")
+        thumb.paste(thumb_rgba, mask=thumb_rgba.getchannel("A"))
         photo = ctk.CTkImage(light_image=thumb, dark_image=thumb, size=thumb.size)
         self._res_label_photo = photo
         self.lbl_res.configure(image=photo, text="")
@@ -1036,6 +1372,10 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
             self.repair_window.lift()
             self.repair_window.focus()
         else:
+            if self._original_rgb_np is None:
+                # Until a repair is applied, the result's RGB bands are the
+                # full-res original; keep them for later repair sessions.
+                self._original_rgb_np = np.asarray(self.current_result)[:, :, :3]
             self.repair_window = RepairWindow(
                 self,
                 self.current_result,
@@ -1059,6 +1399,9 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
             self.repair_window = None
 
         self._current_input_path = None
+        if self._decode_future is not None:
+            self._decode_future.cancel()
+            self._decode_future = None
         self.current_result = None
         self._orig_photo_ref = None
         self._res_label_photo = None
@@ -1084,6 +1427,17 @@ class App(TkinterDnD.Tk if DND_AVAILABLE else ctk.CTk):
         self.btn_clear.configure(state="disabled")
         self._set_status("OK: System ready. Select or drop an image to begin.")
 
+    def _on_close(self):
+        """
+        Cancel queued decodes and inferences before closing. Pool workers are
+        not daemon threads, so a job that is already running still finishes
+        before the interpreter exits; `_closing` makes it return without
+        calling into Tk, which would stall once the main loop has stopped.
+        """
+        self._closing = True
+        self._infer_pool.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
     def save_image(self):
         """Save the result RGBA image as a PNG file."""
         if not self.current_result: